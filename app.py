@@ -1,13 +1,29 @@
 import os
+import copy
+import itertools
+import gzip
 import json
+import queue
+import threading
+import uuid
+import zlib
+from collections import deque, namedtuple
 from datetime import datetime
 from io import BytesIO
 
 import streamlit as st
 import pandas as pd
+import bcrypt
 import plotly.express as px
+import plotly.graph_objects as go
 import qrcode
 from github import Github, GithubException
+from github.Repository import Repository
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib encoder
+    orjson = None
 
 # --- Page Configuration ---
 # Must be the first Streamlit command
@@ -19,10 +35,27 @@ os.environ["STREAMLIT_SERVER_HEADLESS"] = "true"
 
 # --- Constants & Configuration ---
 TSINGHUA_PURPLE = "#660874"
-REPO_DB_PATH = "data/database.json"
+REPO_DB_PATH = "data/database.json.gz"
+LEGACY_REPO_DB_PATH = "data/database.json"  # Uncompressed format, read once for migration
+REPO_LOG_ARCHIVE_PATH = "data/logs-archive-{date}.json"
+MAX_LOGS = 200  # Logs kept in the database file; older entries go to the daily archive
+MAX_SYNC_RETRIES = 3  # Merge-and-retry attempts on write conflicts
+GITHUB_TIMEOUT = 30  # Seconds per GitHub API request
+GITHUB_POOL_SIZE = 3  # HTTP connections shared by the UI and the sync worker
 TARGET_SCORE = 500
 LOW_SCORE_THRESHOLD = 80
 MAX_LEAVE_HOURS = 8.4  # 20% of 42 hours
+DEFAULT_GROUP_PASSWORD = "123"
+SCORE_DIMENSIONS = ["自强不息(准时)", "行胜于言(专注)", "厚德载物(互助)", "无体育不清华(活力)"]
+
+# Quick-score rules: `unit` points per counted `label` on dimension `dim`
+ScoreRule = namedtuple("ScoreRule", ["title", "dim", "unit", "label", "default"])
+SCORE_RULES = {
+    "迟到": ScoreRule("迟到扣分", "自强不息(准时)", -5, "迟到人数", "迟到"),
+    "违纪": ScoreRule("违纪扣分", "行胜于言(专注)", -10, "违纪次数", "课堂违纪"),
+    "互助": ScoreRule("互助加分", "厚德载物(互助)", 5, "表扬人次", "课后整洁/助人"),
+    "活力": ScoreRule("活力加分", "无体育不清华(活力)", 5, "积极人次", "晨跑/课间操"),
+}
 
 # Custom CSS for styling
 st.markdown(f"""
@@ -33,10 +66,37 @@ st.markdown(f"""
     </style>
     """, unsafe_allow_html=True)
 
+# --- Serialization Helpers ---
+
+def dumps_db(db_data):
+    """Serialize the database dict to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(db_data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(db_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads_db(content):
+    """Parse database JSON (str or bytes)."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def encode_db(db_data):
+    """Serialize and gzip the database for storage."""
+    return gzip.compress(dumps_db(db_data), mtime=0)
+
+def decode_db(content):
+    """Inverse of `encode_db`."""
+    return loads_db(gzip.decompress(content))
+
 # --- GitHub Data Storage Functions ---
 
+def _repo_is_usable(repo):
+    """Validate a cached repo handle; failed connections (None) are retried."""
+    return repo is not None and bool(repo.raw_headers)
+
+@st.cache_resource(show_spinner=False, validate=_repo_is_usable)
 def get_github_repo():
-    """Get GitHub repository object using secrets."""
+    """Get GitHub repository object using secrets (cached per server process)."""
     try:
         # Check if secrets are available
         if "github" not in st.secrets:
@@ -44,37 +104,112 @@ def get_github_repo():
             return None
             
         token = st.secrets["github"]["token"]
-        g = Github(token)
+        # Bounded, reused connection pool; overridable via secrets
+        g = Github(
+            token,
+            timeout=st.secrets["github"].get("timeout", GITHUB_TIMEOUT),
+            pool_size=st.secrets["github"].get("pool_size", GITHUB_POOL_SIZE)
+        )
         repo_name = f"{st.secrets['github']['owner']}/{st.secrets['github']['repo']}"
         return g.get_repo(repo_name)
     except Exception as e:
         st.error(f"GitHub Connection Failed: {e}")
         return None
 
-def read_file_from_github(repo, file_path):
-    """Read file content from GitHub."""
+def fetch_file_from_github(repo, file_path):
+    """Read raw file bytes and SHA from GitHub, bypassing the cache."""
     try:
         branch = st.secrets["github"].get("branch", "main")
         contents = repo.get_contents(file_path, ref=branch)
-        return contents.decoded_content.decode("utf-8"), contents.sha
+        return contents.decoded_content, contents.sha
     except GithubException as e:
         if e.status == 404:
             return None, None
         raise e
 
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs={Repository: lambda r: r.full_name})
+def read_file_from_github(repo, file_path):
+    """Read file content from GitHub (cached until the next write)."""
+    return fetch_file_from_github(repo, file_path)
+
+def put_file_to_github(repo, file_path, content, message, sha=None):
+    """Create or update a GitHub file and return the new blob SHA.
+
+    Raises GithubException on failure (409 means `sha` is stale).
+    """
+    branch = st.secrets["github"].get("branch", "main")
+    if sha:
+        result = repo.update_file(file_path, message, content, sha, branch=branch)
+    else:
+        result = repo.create_file(file_path, message, content, branch=branch)
+    read_file_from_github.clear()
+    return result["content"].sha
+
 def write_file_to_github(repo, file_path, content, message, sha=None):
-    """Write content to GitHub file."""
+    """Write content to GitHub file with UI feedback; returns the new SHA or None."""
     try:
-        branch = st.secrets["github"].get("branch", "main")
-        if sha:
-            repo.update_file(file_path, message, content, sha, branch=branch)
-        else:
-            repo.create_file(file_path, message, content, branch=branch)
-        return True
+        return put_file_to_github(repo, file_path, content, message, sha)
     except Exception as e:
         st.error(f"GitHub Write Failed: {e}")
+        return None
+
+# --- Group Authentication ---
+
+@st.cache_resource(show_spinner=False)
+def default_password_hash():
+    """bcrypt hash of the default group password, computed once per process."""
+    return bcrypt.hashpw(DEFAULT_GROUP_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+def with_default_passwords(group_passwords, groups):
+    """Fill in the default password hash for groups that have none yet."""
+    for group in groups:
+        if group not in group_passwords:
+            group_passwords[group] = default_password_hash()
+    return group_passwords
+
+def check_group_password(group, password):
+    """Verify a group password against its stored bcrypt hash."""
+    hashed = st.session_state.group_passwords.get(group)
+    if not hashed or not password:
+        return False
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError:
+        # Malformed hash in the database: treat as a failed login
         return False
 
+def groups_frame(groups):
+    """Build the groups DataFrame, indexed by group name for O(1) `.at` lookups."""
+    df = pd.DataFrame(groups)
+    return df.set_index("小组", drop=False).rename_axis(None)
+
+def group_records(df):
+    """Convert the groups DataFrame to a list of row dicts with native Python values.
+
+    Converts column-wise via `tolist()`, avoiding the per-cell boxing of
+    `to_dict(orient="records")`.
+    """
+    cols = df.columns.tolist()
+    return [dict(zip(cols, values)) for values in zip(*(df[c].tolist() for c in cols))]
+
+def with_approval_ids(approvals):
+    """Give every approval a stable id (older entries were saved without one).
+
+    Missing ids are derived from the entry's content, so every session that
+    loads the same file assigns the same id; repeated identical entries are
+    told apart by their occurrence count.
+    """
+    seen = {}
+    for item in approvals:
+        if "id" not in item:
+            if orjson is not None:
+                key = orjson.dumps(item, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+            else:
+                key = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+            seen[key] = seen.get(key, 0) + 1
+            item["id"] = uuid.uuid5(uuid.NAMESPACE_OID, f"{key}#{seen[key]}").hex
+    return approvals
+
 def load_data():
     """Load data from GitHub or initialize default data."""
     repo = get_github_repo()
@@ -83,39 +218,51 @@ def load_data():
         st.warning("Running in offline mode (GitHub not connected). Data will not be saved permanently.")
         return create_default_data()
 
-    # Load All Data from Single JSON
-    content, _ = read_file_from_github(repo, REPO_DB_PATH)
+    # Load All Data from Single compressed JSON
+    content, sha = read_file_from_github(repo, REPO_DB_PATH)
+    st.session_state.sync.sha = sha
+    decode = decode_db
+    if not content:
+        # Migrate from the uncompressed file; the first save creates the new one
+        content, _ = read_file_from_github(repo, LEGACY_REPO_DB_PATH)
+        decode = loads_db
     
     if content:
         try:
-            db = json.loads(content)
-            df = pd.DataFrame(db.get("groups", []))
+            db = decode(content)
+            df = groups_frame(db.get("groups", []))
             logs = db.get("logs", [])
-            approvals = db.get("approvals", [])
+            approvals = with_approval_ids(db.get("approvals", []))
             leave_records = db.get("leave_records", [])
-            return df, logs, approvals, leave_records
-        except json.JSONDecodeError:
+            group_passwords = with_default_passwords(db.get("group_passwords", {}), df["小组"])
+            # The worker merges onto the file as stored, including its unarchived log overflow
+            db["group_passwords"] = group_passwords
+            st.session_state.sync.remote = copy.deepcopy(db)
+            return df, logs, approvals, leave_records, group_passwords
+        except (ValueError, OSError, EOFError, zlib.error):
             st.error("Database file is corrupted. Loading default data.")
             return create_default_data()
     else:
         # Initialize if not exists
         st.info("Initializing new database on GitHub...")
-        df, logs, approvals, leave_records = create_default_data()
+        df, logs, approvals, leave_records, group_passwords = create_default_data()
         
         # Save initial to GitHub
         initial_db = {
-            "groups": df.to_dict(orient="records"),
+            "groups": group_records(df),
             "logs": logs,
             "approvals": approvals,
-            "leave_records": leave_records
+            "leave_records": leave_records,
+            "group_passwords": group_passwords
         }
-        write_file_to_github(repo, REPO_DB_PATH, json.dumps(initial_db, ensure_ascii=False, indent=2), "Init database.json")
-        return df, logs, approvals, leave_records
+        st.session_state.sync.sha = write_file_to_github(repo, REPO_DB_PATH, encode_db(initial_db), "Init database")
+        st.session_state.sync.remote = copy.deepcopy(initial_db)
+        return df, logs, approvals, leave_records, group_passwords
 
 def create_default_data():
     """Create default initial data structure."""
     groups = ["一组", "二组", "三组", "四组", "五组", "六组", "七组"]
-    df = pd.DataFrame({ 
+    df = groups_frame({ 
         "小组": groups, 
         "总分": [100.0] * 7, 
         "自强不息(准时)": [25.0] * 7, 
@@ -124,134 +271,514 @@ def create_default_data():
         "无体育不清华(活力)": [25.0] * 7,
         "总请假时长": [0.0] * 7
     })
-    return df, [], [], []
+    return df, [], [], [], with_default_passwords({}, groups)
+
+def set_logs(logs):
+    """Store logs (newest first) as a deque capped at MAX_LOGS.
+
+    Lines past the cap stay in the database file; the sync worker archives
+    them when it writes.
+    """
+    st.session_state.logs = deque(itertools.islice(logs, MAX_LOGS), maxlen=MAX_LOGS)
+
+def add_log(log_msg):
+    """Prepend a log line in O(1) and remember it for the next save."""
+    st.session_state.logs.appendleft(log_msg)
+    st.session_state.unsaved_logs.appendleft(log_msg)
+
+def remove_approval(approval_id):
+    """Drop an approval from the queue by its id."""
+    st.session_state.approvals = [a for a in st.session_state.approvals if a["id"] != approval_id]
+
+def build_db_snapshot():
+    """Build the database dict from current session state."""
+    return {
+        "groups": group_records(st.session_state.data),
+        "logs": list(st.session_state.logs),
+        "approvals": list(st.session_state.approvals),
+        "leave_records": list(st.session_state.leave_records),
+        "group_passwords": dict(st.session_state.group_passwords)
+    }
+
+def mark_data_changed():
+    """Bump the per-session version of `st.session_state.data` after a mutation."""
+    st.session_state.data_version = st.session_state.get("data_version", 0) + 1
+
+def apply_db_snapshot(db):
+    """Replace session state data with the contents of a database dict."""
+    st.session_state.data = groups_frame(db.get("groups", []))
+    mark_data_changed()
+    set_logs(db.get("logs", []))
+    st.session_state.approvals = with_approval_ids(db.get("approvals", []))
+    st.session_state.leave_records = db.get("leave_records", [])
+    st.session_state.group_passwords = with_default_passwords(db.get("group_passwords", {}), st.session_state.data["小组"])
+
+def _added_items(base, local):
+    """Items present in local but not in base (multiset difference, order kept)."""
+    remaining = list(base)
+    added = []
+    for item in local:
+        if item in remaining:
+            remaining.remove(item)
+        else:
+            added.append(item)
+    return added
+
+def _renamed(items, renames):
+    """Point items whose "group" was renamed (old -> new in `renames`) at the new name."""
+    if not renames:
+        return items
+    return [{**item, "group": renames[item["group"]]} if item.get("group") in renames else item for item in items]
+
+def _handled_elsewhere(base, remote, approved):
+    """Locally approved entries whose approval another session has already handled.
+
+    `approved` maps approval id -> {"item", "log"} for approvals applied since
+    base. An id that was pending in base but is gone from remote was approved
+    or rejected elsewhere, so its local effect must not be replayed.
+    """
+    base_ids = {a["id"] for a in base["approvals"]}
+    remote_ids = {a.get("id") for a in remote.get("approvals", [])}
+    return [entry for approval_id, entry in approved.items() if approval_id in base_ids and approval_id not in remote_ids]
+
+def merge_db(base, local, remote, new_logs=(), skipped=()):
+    """Three-way merge of local changes (relative to base) onto remote data.
+
+    Score columns are merged as deltas so concurrent edits add up instead of
+    overwriting each other; list entries added or removed locally are replayed
+    on top of the remote lists. Local renames are applied to remote approvals
+    and leave records that still use the old group name. Log lines written
+    since base are passed in as `new_logs` (newest first): identical lines
+    are common, so they can't be recovered by diffing base and local logs.
+    The score/hours delta, leave record and log line of each `skipped`
+    approval (see `_handled_elsewhere`) are left out of the replay.
+
+    Returns the merged database and the log lines cut off by the MAX_LOGS cap,
+    which the caller must keep for archiving.
+    """
+    merged_groups = []
+    renames = {}
+    for i, remote_row in enumerate(remote.get("groups", [])):
+        row = dict(remote_row)
+        if i < len(base["groups"]) and i < len(local["groups"]):
+            base_row, local_row = base["groups"][i], local["groups"][i]
+            for col, value in local_row.items():
+                if col == "小组":
+                    if value != base_row.get(col):
+                        row[col] = value
+                        renames[base_row.get(col)] = value
+                else:
+                    row[col] = row.get(col, 0) + (value - base_row.get(col, 0))
+        merged_groups.append(row)
+
+    rows = {row.get("小组"): row for row in merged_groups}
+    added_leaves = _added_items(base["leave_records"], local["leave_records"])
+    new_logs = list(new_logs)
+    for entry in skipped:
+        item = entry["item"]
+        group = renames.get(item["group"], item["group"])
+        row = rows.get(group)
+        if item.get("type") == "leave":
+            if row:
+                row["总请假时长"] -= item["hours"]
+            record = {"group": group, "name": item["name"], "hours": item["hours"]}
+            if record in added_leaves:
+                added_leaves.remove(record)
+        elif row:
+            row[item["dimension"]] -= item["change"]
+            row["总分"] -= item["change"]
+        if entry["log"] in new_logs:
+            new_logs.remove(entry["log"])
+
+    base_ids = {a["id"] for a in base["approvals"]}
+    local_ids = {a["id"] for a in local["approvals"]}
+    removed_ids = base_ids - local_ids
+    merged_approvals = [a for a in remote.get("approvals", []) if a.get("id") not in removed_ids]
+    merged_approvals += [a for a in local["approvals"] if a["id"] not in base_ids]
+    merged_approvals = _renamed(merged_approvals, renames)
+
+    # Leave records retargeted by a rename show up as removed + added
+    merged_leaves = list(remote.get("leave_records", []))
+    for record in _added_items(local["leave_records"], base["leave_records"]):
+        if record in merged_leaves:
+            merged_leaves.remove(record)
+    merged_leaves = _renamed(merged_leaves, renames) + added_leaves
+
+    # Password changes and renames: replay keys changed or removed locally
+    base_pw, local_pw = base.get("group_passwords", {}), local.get("group_passwords", {})
+    merged_pw = {g: h for g, h in remote.get("group_passwords", {}).items() if g in local_pw or g not in base_pw}
+    merged_pw.update({g: h for g, h in local_pw.items() if base_pw.get(g) != h})
+
+    logs = new_logs + remote.get("logs", [])
+    return {
+        "groups": merged_groups,
+        "logs": logs[:MAX_LOGS],
+        "approvals": merged_approvals,
+        "leave_records": merged_leaves,
+        "group_passwords": merged_pw
+    }, logs[MAX_LOGS:]
+
+def _with_log_archive(db_data, cut, remote, backlog):
+    """Carry log lines cut from `db_data` in its `log_overflow` until an archive is due.
+
+    The overflow lives in the database file itself, so lines are never held in
+    session memory. It is handed over for archiving (and cleared from the file)
+    on the first write of each day, or once MAX_LOGS lines have piled up.
+    Returns the database to write and the lines to archive after writing it.
+    """
+    overflow = cut + remote.get("log_overflow", []) + backlog
+    today = datetime.now().strftime("%Y%m%d")
+    if overflow and (remote.get("log_archive_date") != today or len(overflow) >= MAX_LOGS):
+        db_data.update(log_overflow=[], log_archive_date=today)
+        return db_data, overflow
+    db_data.update(log_overflow=overflow, log_archive_date=remote.get("log_archive_date"))
+    return db_data, []
+
+# --- Background Sync ---
+
+class SyncState:
+    """Per-session sync bookkeeping, shared between the session and the sync worker."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sha = None             # SHA of the database file as last read/written
+        self.remote = None          # Database content at `sha`
+        self.unsynced_base = None   # Base of changes whose write failed
+        self.unsynced_logs = []     # Log lines of writes that failed, newest first
+        self.unsynced_approved = {} # Approvals applied by writes that failed
+        self.skipped = 0            # Approvals dropped because another session handled them
+        self.pending = 0            # Saves queued but not yet written
+        self.last_ok = None         # Outcome of the most recent write
+        self.error = None
+        self.diverged = False       # Remote changes were merged in by the worker
+        self.archive_backlog = []   # Lines cleared from the file whose archive write failed
+
+class SyncWorker:
+    """Daemon thread that drains queued database writes to GitHub.
+
+    Each snapshot is a full replacement of the file, so queued saves from the
+    same session are coalesced and only the latest snapshot is written.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, name="github-sync", daemon=True).start()
+
+    def submit(self, repo, state, db_data, base, new_logs, approved, reason):
+        with state.lock:
+            state.pending += 1
+        self.queue.put({
+            "repo": repo, "state": state, "db": db_data, "base": base,
+            "new_logs": new_logs, "approved": approved, "reason": reason, "count": 1
+        })
+
+    def _run(self):
+        while True:
+            for job in self._drain():
+                self._process(job)
+
+    def _drain(self):
+        """Block for one job, then coalesce everything queued behind it per session."""
+        jobs = {}
+        job = self.queue.get()
+        while job is not None:
+            older = jobs.get(id(job["state"]))
+            if older:
+                job["base"] = older["base"]
+                job["new_logs"] = job["new_logs"] + older["new_logs"]
+                job["approved"] = {**older["approved"], **job["approved"]}
+                job["reason"] = f"{older['reason']}; {job['reason']}"
+                job["count"] += older["count"]
+            jobs[id(job["state"])] = job
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                job = None
+        return list(jobs.values())
+
+    def _process(self, job):
+        state = job["state"]
+        archive = []
+        try:
+            archive = self._write_db(job)
+            ok, error = True, None
+        except Exception as e:
+            with state.lock:
+                if state.unsynced_base is None:
+                    state.unsynced_base = job["base"]
+                state.unsynced_logs = job["new_logs"]
+                state.unsynced_approved = job["approved"]
+            ok, error = False, str(e)
+        if archive:
+            try:
+                self._write_archive(job["repo"], archive)
+            except Exception:
+                # Put back into the file's overflow by this session's next write
+                with state.lock:
+                    state.archive_backlog = archive + state.archive_backlog
+        with state.lock:
+            state.pending -= job["count"]
+            state.last_ok, state.error = ok, error
+
+    def _write_db(self, job):
+        """Write against the last known SHA; on a conflict merge onto the remote file and retry.
+
+        Returns the log lines removed from the file by this write, for archiving.
+        """
+        state, repo = job["state"], job["repo"]
+        base = state.unsynced_base if state.unsynced_base is not None else job["base"]
+        remote = state.remote if state.remote is not None else base
+        job["new_logs"] = job["new_logs"] + state.unsynced_logs
+        job["approved"] = {**state.unsynced_approved, **job["approved"]}
+        # Only this thread touches the backlog between here and the write below
+        backlog = state.archive_backlog
+
+        sha = state.sha
+        for _ in range(MAX_SYNC_RETRIES):
+            # Merging onto the exact content being replaced tells us which lines leave it
+            skipped = _handled_elsewhere(base, remote, job["approved"])
+            db_data, cut = merge_db(base, job["db"], remote, job["new_logs"], skipped)
+            db_data, archive = _with_log_archive(db_data, cut, remote, backlog)
+            try:
+                sha = put_file_to_github(repo, REPO_DB_PATH, encode_db(db_data), f"Update: {job['reason']}", sha)
+                break
+            except GithubException as e:
+                # 409: stale SHA; 422 without a SHA: someone else created the file first
+                if e.status != 409 and not (e.status == 422 and sha is None):
+                    raise e
+                # Someone else wrote first: merge our changes onto theirs
+                content, sha = fetch_file_from_github(repo, REPO_DB_PATH)
+                remote = decode_db(content) if content else base
+        else:
+            raise RuntimeError("并发冲突过多")
+
+        with state.lock:
+            state.sha, state.remote = sha, db_data
+            state.unsynced_base = None
+            state.unsynced_logs = []
+            state.unsynced_approved = {}
+            state.skipped += len(skipped)
+            state.archive_backlog = []
+            if any(db_data.get(key) != value for key, value in job["db"].items()):
+                state.diverged = True
+        return archive
+
+    def _write_archive(self, repo, lines):
+        """Prepend lines (newest first) to today's log archive file."""
+        path = REPO_LOG_ARCHIVE_PATH.format(date=datetime.now().strftime("%Y%m%d"))
+        for _ in range(MAX_SYNC_RETRIES):
+            content, sha = fetch_file_from_github(repo, path)
+            archived = loads_db(content) if content else []
+            try:
+                put_file_to_github(repo, path, dumps_db(lines + archived), f"Archive {len(lines)} logs", sha)
+                return
+            except GithubException as e:
+                if e.status != 409 and not (e.status == 422 and sha is None):
+                    raise e
+        raise RuntimeError("并发冲突过多")
+
+@st.cache_resource(show_spinner=False)
+def get_sync_worker():
+    """Start the process-wide sync worker once."""
+    return SyncWorker()
 
 def save_all_data(reason="Update data"):
-    """Save all session state data to GitHub with UI feedback."""
-    status = st.status("正在同步数据到云端...", expanded=True)
-    try:
-        repo = get_github_repo()
-        if not repo:
-            status.update(label="GitHub 连接失败", state="error")
-            return False
-
-        # Prepare DB object
-        db_data = {
-            "groups": st.session_state.data.to_dict(orient="records"),
-            "logs": st.session_state.logs,
-            "approvals": st.session_state.approvals,
-            "leave_records": st.session_state.leave_records
-        }
-        
-        json_content = json.dumps(db_data, ensure_ascii=False, indent=2)
-        
-        # Read SHA first (to allow update)
-        status.write("正在读取远程数据...")
-        _, sha = read_file_from_github(repo, REPO_DB_PATH)
-        
-        # Write Single File
-        status.write("正在写入新数据...")
-        success = write_file_to_github(repo, REPO_DB_PATH, json_content, f"Update: {reason}", sha)
-        
-        if not success:
-            status.update(label="保存失败", state="error")
-            return False
-            
-        status.update(label="✅ 同步成功！", state="complete", expanded=False)
-        return True
-    except Exception as e:
-        status.update(label=f"发生错误: {str(e)}", state="error")
+    """Queue a snapshot of session state for the background GitHub sync.
+
+    Returns as soon as the snapshot is queued; the write outcome is picked up
+    by `reconcile_sync` on a later rerun.
+    """
+    repo = get_github_repo()
+    if not repo:
+        st.error("GitHub 连接失败，数据未保存")
         return False
 
+    db_data = copy.deepcopy(build_db_snapshot())
+    new_logs = list(st.session_state.unsaved_logs)
+    st.session_state.unsaved_logs.clear()
+    approved, st.session_state.unsaved_approvals = st.session_state.unsaved_approvals, {}
+    get_sync_worker().submit(repo, st.session_state.sync, db_data, st.session_state.db_base, new_logs, approved, reason)
+    st.session_state.db_base = db_data
+    return True
+
+def reconcile_sync():
+    """Fold background write results back into session state once the worker is idle."""
+    state = st.session_state.sync
+    with state.lock:
+        if state.pending:
+            return
+        diverged, state.diverged = state.diverged, False
+        skipped, state.skipped = state.skipped, 0
+        remote = state.remote
+        st.session_state.last_sync_ok = state.last_ok
+
+    if skipped:
+        st.warning(f"{skipped} 条申请已被其他管理员处理，本次审批未重复计入")
+    if diverged:
+        # Pull in remote changes merged by the worker; lines cut here are still
+        # in the file and leave it (to be archived) on the worker's next write
+        merged, _ = merge_db(st.session_state.db_base, build_db_snapshot(), remote, st.session_state.unsaved_logs)
+        apply_db_snapshot(merged)
+        st.session_state.db_base = copy.deepcopy(remote)
+
+@st.cache_data(show_spinner=False)
+def over_limit_leaves(records):
+    """Per-person leave totals above MAX_LEAVE_HOURS, keyed by (group, name).
+
+    `records` is a tuple of (group, name, hours) tuples, so the cache is keyed
+    on the records themselves and sessions never share a stale result.
+    """
+    if not records:
+        return {}
+    totals = pd.DataFrame(records, columns=["group", "name", "hours"]).groupby(["group", "name"])["hours"].sum()
+    return totals[totals > MAX_LEAVE_HOURS].to_dict()
+
+@st.cache_data(show_spinner=False)
+def make_qr_png(url: str) -> bytes:
+    """Render a QR code for url as PNG bytes."""
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    # Convert to bytes
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+# --- Chart Builders ---
+# Figures are cached on the DataFrame contents (Streamlit hashes DataFrames
+# natively), so reruns that don't change scores reuse the built figure.
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_radar(df):
+    """Radar chart of the four score dimensions per group."""
+    # One closed trace per group, built straight from the wide columns (no melt)
+    colors = px.colors.qualitative.Prism
+    theta = SCORE_DIMENSIONS + SCORE_DIMENSIONS[:1]
+    columns = [df[dim].tolist() for dim in SCORE_DIMENSIONS]
+    fig = go.Figure()
+    for i, group in enumerate(df["小组"].tolist()):
+        r = [col[i] for col in columns]
+        fig.add_trace(go.Scatterpolar(
+            r=r + r[:1], theta=theta, name=group, mode="lines",
+            line=dict(color=colors[i % len(colors)])
+        ))
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+        legend=dict(orientation="h", yanchor="top", y=-0.15, xanchor="center", x=0.5)
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_rank(df):
+    """Horizontal bar chart of groups ranked by total score."""
+    rank_df = df[["小组", "总分"]].sort_values(by="总分", ascending=False)
+    fig_rank = px.bar(
+        rank_df, x="总分", y="小组", orientation='h',
+        color="总分", color_continuous_scale="Purples"
+    )
+    fig_rank.update_layout(showlegend=False)
+    return fig_rank
+
+def dashboard_figures():
+    """Radar and ranking figures, rebuilt only when `data_version` changes.
+
+    Memoized per session on the version int, so unchanged reruns skip even
+    hashing the DataFrame for the st.cache_data lookup.
+    """
+    version = st.session_state.data_version
+    cached = st.session_state.get("figures")
+    if cached is None or cached[0] != version:
+        df = st.session_state.data
+        cached = (version, build_radar(df), build_rank(df))
+        st.session_state.figures = cached
+    return cached[1], cached[2]
+
 # --- Initialization ---
 
 if 'data' not in st.session_state:
+    st.session_state.sync = SyncState()
+    st.session_state.data_version = 0
+    st.session_state.unsaved_logs = deque()  # Lines added since the last save, newest first
+    st.session_state.unsaved_approvals = {}  # Approvals applied since the last save, by id
     try:
-        st.session_state.data, st.session_state.logs, st.session_state.approvals, st.session_state.leave_records = load_data()
+        st.session_state.data, st.session_state.logs, st.session_state.approvals, st.session_state.leave_records, st.session_state.group_passwords = load_data()
     except Exception as e:
         st.error(f"Failed to load data: {e}")
-        st.session_state.data, st.session_state.logs, st.session_state.approvals, st.session_state.leave_records = create_default_data()
+        st.session_state.data, st.session_state.logs, st.session_state.approvals, st.session_state.leave_records, st.session_state.group_passwords = create_default_data()
+    set_logs(st.session_state.logs)
+    # Last synced state, used as the merge base on write conflicts
+    st.session_state.db_base = copy.deepcopy(build_db_snapshot())
 
-# Default Group Passwords (In a real app, these should be secure)
-GROUP_PASSWORDS = {g: "123" for g in st.session_state.data["小组"]}
+reconcile_sync()
+
+# Group names for widgets, materialized once per full rerun (renames trigger one)
+groups_list = st.session_state.data.index.tolist()
 
 # --- Dialog Functions ---
 
+def apply_score(group, rule, count, reason):
+    """Apply `count` units of a score rule to a group and log it (the caller saves)."""
+    change = count * rule.unit
+    st.session_state.data.at[group, rule.dim] += change
+    st.session_state.data.at[group, "总分"] += change
+    add_log(f"{datetime.now().strftime('%H:%M')} | {group} {rule.dim} {change:+d} | 原因: {reason} ({rule.label}: {count})")
+    mark_data_changed()
+
 @st.dialog("批量快速评分", width="large")
-def batch_quick_score_dialog(title, dimension, unit, label, default_reason):
-    st.markdown(f"### {title}")
-    st.markdown(f"**计分规则：{label} × {unit} 分**")
+def batch_quick_score_dialog(rule):
+    st.markdown(f"### {rule.title}")
+    st.markdown(f"**计分规则：{rule.label} × {rule.unit} 分**")
     
     # Use st.form to prevent rerun on every edit
-    with st.form(key=f"form_{title}"):
+    with st.form(key=f"form_{rule.title}"):
         st.caption("请直接在下方输入各组数量，数值为0表示无变动")
         
         # Create input fields for each group
         input_data = []
-        for group in st.session_state.data["小组"]:
+        for group in groups_list:
             c1, c2, c3 = st.columns([2, 2, 4])
             with c1:
                 st.markdown(f"**{group}**")
             with c2:
-                val = st.number_input(f"{label}", min_value=0, step=1, key=f"num_{title}_{group}", label_visibility="collapsed")
+                val = st.number_input(f"{rule.label}", min_value=0, step=1, key=f"num_{rule.title}_{group}", label_visibility="collapsed")
             with c3:
-                reason = st.text_input(f"备注", value=default_reason, key=f"reason_{title}_{group}", label_visibility="collapsed")
+                reason = st.text_input(f"备注", value=rule.default, key=f"reason_{rule.title}_{group}", label_visibility="collapsed")
             
-            input_data.append({"小组": group, label: val, "备注": reason})
+            input_data.append((group, val, reason))
             
         st.markdown("---")
         submit_btn = st.form_submit_button("确认提交", type="primary")
     
     if submit_btn:
-        count_updates = 0
-        updates_info = [] 
+        updates = [(group, count, reason) for group, count, reason in input_data if count > 0]
         
-        # Calculate changes in memory first
-        for row in input_data:
-            count = row[label]
-            if count > 0:
-                group = row["小组"]
-                reason = row["备注"]
-                change = count * unit
+        if updates:
+            # Apply in reverse so the first group's log ends up on top
+            for group, count, reason in reversed(updates):
+                apply_score(group, rule, count, reason)
                 
-                # Update Session State Data
-                idx = st.session_state.data[st.session_state.data["小组"] == group].index[0]
-                st.session_state.data.loc[idx, dimension] += change
-                st.session_state.data.loc[idx, "总分"] += change
-                
-                # Prepare Log
-                log_msg = f"{datetime.now().strftime('%H:%M')} | {group} {dimension} {change:+d} | 原因: {reason} ({label}: {count})"
-                updates_info.append(log_msg)
-                count_updates += 1
-        
-        if count_updates > 0:
-            # Batch Insert Logs (reverse order to keep latest first in list)
-            for msg in reversed(updates_info):
-                st.session_state.logs.insert(0, msg)
-                
-            # Single DB Sync
-            if save_all_data(f"Batch update: {title}"):
-                st.success(f"成功更新 {count_updates} 个小组的分数！")
+            # Single DB Sync for all groups (one commit per submission)
+            if save_all_data(f"Batch update: {rule.title} ({len(updates)} groups)"):
+                st.success(f"成功更新 {len(updates)} 个小组的分数！")
                 st.rerun()
         else:
             st.warning("未检测到有效变动（数量均为0）")
 
 @st.dialog("违纪扣分")
-def single_quick_score_dialog(dimension, unit, label, default_reason):
-    st.markdown(f"**当前维度：{dimension}**")
-    st.markdown(f"**规则：每{label} {unit:+d} 分**")
+def single_quick_score_dialog(rule):
+    st.markdown(f"**当前维度：{rule.dim}**")
+    st.markdown(f"**规则：每{rule.label} {rule.unit:+d} 分**")
     
-    group = st.selectbox("选择小组", st.session_state.data["小组"].tolist())
-    count = st.number_input(f"输入{label}", min_value=1, value=1, step=1)
-    reason = st.text_input("备注", value=default_reason)
+    with st.form(key=f"form_single_{rule.label}"):
+        group = st.selectbox("选择小组", groups_list)
+        count = st.number_input(f"输入{rule.label}", min_value=1, value=1, step=1)
+        reason = st.text_input("备注", value=rule.default)
+        submit_btn = st.form_submit_button("确认提交")
     
-    if st.button("确认提交"):
-        change = count * unit
-        idx = st.session_state.data[st.session_state.data["小组"] == group].index[0]
-        st.session_state.data.loc[idx, dimension] += change
-        st.session_state.data.loc[idx, "总分"] += change
-        log_msg = f"{datetime.now().strftime('%H:%M')} | {group} {dimension} {change:+d} | 原因: {reason} ({label}: {count})"
-        st.session_state.logs.insert(0, log_msg)
+    if submit_btn:
+        apply_score(group, rule, count, reason)
         
         # DB Sync
         save_all_data(f"Update score: {group}")
@@ -260,23 +787,24 @@ def single_quick_score_dialog(dimension, unit, label, default_reason):
         st.rerun()
 
 @st.dialog("提交加分/扣分申请")
-def leader_quick_submit_dialog(group_name, dimension, unit, label, default_reason):
-    st.markdown(f"### 📝 {group_name} - {label}登记")
-    st.markdown(f"**规则：每{label} {unit:+d} 分**")
+def leader_quick_submit_dialog(group_name, rule, default_reason=None):
+    st.markdown(f"### 📝 {group_name} - {rule.label}登记")
+    st.markdown(f"**规则：每{rule.label} {rule.unit:+d} 分**")
     
-    with st.form(key=f"form_leader_{group_name}_{label}"):
-        count = st.number_input(f"输入{label}", min_value=1, value=1, step=1)
-        reason = st.text_input("备注说明", value=default_reason)
+    with st.form(key=f"form_leader_{group_name}_{rule.label}"):
+        count = st.number_input(f"输入{rule.label}", min_value=1, value=1, step=1)
+        reason = st.text_input("备注说明", value=default_reason or rule.default)
         submit_btn = st.form_submit_button("提交审核")
     
     if submit_btn:
-        change = count * unit
+        change = count * rule.unit
         item = {
+            "id": uuid.uuid4().hex,
             "timestamp": datetime.now().strftime('%H:%M'),
             "group": group_name,
-            "dimension": dimension,
+            "dimension": rule.dim,
             "change": change,
-            "reason": f"{reason} ({label}: {count})",
+            "reason": f"{reason} ({rule.label}: {count})",
             "status": "pending"
         }
         # Add to approvals
@@ -305,6 +833,7 @@ def leave_submit_dialog(group_name):
             return
         
         item = {
+            "id": uuid.uuid4().hex,
             "timestamp": datetime.now().strftime('%H:%M'),
             "type": "leave",
             "group": group_name,
@@ -322,9 +851,161 @@ def leave_submit_dialog(group_name):
         st.success("✅ 请假申请已提交！请通知管理员审核。")
         st.rerun()
 
+# --- Approval Actions ---
+# Each action applies all of its state changes, then syncs them as one write.
+
+def approve_leave(item):
+    """Record an approved leave, add its hours to the group total and sync."""
+    if item['group'] not in st.session_state.data.index:
+        st.error(f"小组 {item['group']} 不存在，请驳回该申请")
+        return False
+    st.session_state.leave_records.append({
+        "group": item['group'],
+        "name": item['name'],
+        "hours": item['hours']
+    })
+    st.session_state.data.at[item['group'], "总请假时长"] += item['hours']
+    mark_data_changed()
+    log_msg = f"{datetime.now().strftime('%H:%M')} | [请假批准] {item['group']}-{item['name']} 请假 {item['hours']}小时"
+    add_log(log_msg)
+    st.session_state.unsaved_approvals[item['id']] = {"item": item, "log": log_msg}
+    remove_approval(item['id'])
+    return save_all_data(f"Approve leave: {item['name']}")
+
+def approve_score(item):
+    """Apply an approved score change to its group and sync."""
+    if item['group'] not in st.session_state.data.index:
+        st.error(f"小组 {item['group']} 不存在，请驳回该申请")
+        return False
+    st.session_state.data.at[item['group'], item['dimension']] += item['change']
+    st.session_state.data.at[item['group'], "总分"] += item['change']
+    mark_data_changed()
+    log_msg = f"{datetime.now().strftime('%H:%M')} | [审核通过] {item['group']} {item['dimension']} {item['change']:+d} | 原因: {item['reason']}"
+    add_log(log_msg)
+    st.session_state.unsaved_approvals[item['id']] = {"item": item, "log": log_msg}
+    remove_approval(item['id'])
+    return save_all_data(f"Approve score: {item['group']}")
+
+# --- Fragments ---
+# Sections wrapped in st.fragment rerun on their own when their widgets fire.
+
+@st.fragment
+def render_approvals():
+    """Admin approval queue; rejections rerun only this fragment."""
+    if st.session_state.approvals:
+        st.warning(f"🔔 有 {len(st.session_state.approvals)} 条待审核申请")
+        with st.expander("📋 审核队列 (点击处理)", expanded=True):
+            # Items are removed by id, so iterating the list directly is safe
+            for item in st.session_state.approvals:
+                st.markdown(f"**{item['group']}**")
+
+                if item.get("type") == "leave":
+                    st.warning(f"📄 请假申请 | {item['name']} | {item['hours']}小时")
+                    st.text(f"原因: {item['reason']}")
+
+                    c1, c2 = st.columns(2)
+                    if c1.button("✅ 批准", key=f"app_{item['id']}"):
+                        if approve_leave(item):
+                            st.rerun()
+
+                    if c2.button("❌ 驳回", key=f"rej_{item['id']}"):
+                        remove_approval(item['id'])
+                        # DB Sync
+                        save_all_data(f"Reject leave: {item['name']}")
+                        # Only the queue changed; skip rebuilding the dashboard
+                        st.rerun(scope="fragment")
+
+                else:
+                    # Normal score approval
+                    st.caption(f"{item['dimension']} | {item['change']:+d}分 | {item['timestamp']}")
+                    st.text(f"原因: {item['reason']}")
+
+                    c1, c2 = st.columns(2)
+                    if c1.button("✅ 通过", key=f"app_{item['id']}"):
+                        if approve_score(item):
+                            st.rerun()
+
+                    if c2.button("❌ 驳回", key=f"rej_{item['id']}"):
+                        remove_approval(item['id'])
+                        # DB Sync
+                        save_all_data(f"Reject score: {item['group']}")
+                        # Only the queue changed; skip rebuilding the dashboard
+                        st.rerun(scope="fragment")
+                st.divider()
+    else:
+        st.success("✨ 所有申请已处理完毕")
+
+@st.fragment
+def render_progress():
+    """Per-group marathon progress bars."""
+    # Plain tuples avoid building a Series per row (column names aren't identifiers)
+    rows = st.session_state.data[["小组", "总分", "总请假时长"]].itertuples(index=False, name=None)
+
+    # Use st.columns(2) for responsive grid
+    for i, (group, total_score, leave_hours) in enumerate(rows):
+        if i % 2 == 0:
+            cols = st.columns(2)
+    
+        col_idx = i % 2
+        with cols[col_idx]:
+            st.markdown(f"**{group}**")
+            progress = min(total_score / TARGET_SCORE, 1.0)
+            st.progress(progress)
+            st.caption(f"当前积分: {int(total_score)} 分")
+        
+            # Display leave info
+            if leave_hours > 0:
+                st.info(f"📅 请假累计: {leave_hours}h")
+
+@st.fragment
+def render_charts():
+    """Radar and ranking chart tabs."""
+    fig, fig_rank = dashboard_figures()
+    tab1, tab2 = st.tabs(["🕸️ 能量雷达", "🏆 积分排行"])
+
+    with tab1:
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with tab2:
+        st.plotly_chart(fig_rank, use_container_width=True)
+
+@st.fragment
+def render_quick_score():
+    """Admin quick-score buttons; opening a dialog reruns only this fragment."""
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("⏱️ 迟到扣分", use_container_width=True):
+            batch_quick_score_dialog(SCORE_RULES["迟到"])
+        if st.button("🤝 互助加分", use_container_width=True):
+            batch_quick_score_dialog(SCORE_RULES["互助"])
+    with col2:
+        if st.button("📵 违纪扣分", use_container_width=True):
+            single_quick_score_dialog(SCORE_RULES["违纪"])
+        if st.button("🏃 活力加分", use_container_width=True):
+            batch_quick_score_dialog(SCORE_RULES["活力"])
+
+@st.fragment
+def render_leader_actions(selected_group):
+    """Group leader submission buttons; opening a dialog reruns only this fragment."""
+    c1, c2 = st.columns(2)
+    with c1:
+        if st.button("⏱️ 登记迟到", use_container_width=True):
+            leader_quick_submit_dialog(selected_group, SCORE_RULES["迟到"], "组员迟到")
+        if st.button("🏃 登记活力", use_container_width=True):
+            leader_quick_submit_dialog(selected_group, SCORE_RULES["活力"])
+    with c2:
+        if st.button("🤝 登记互助", use_container_width=True):
+            leader_quick_submit_dialog(selected_group, SCORE_RULES["互助"])
+        if st.button("📄 登记请假", use_container_width=True):
+            leave_submit_dialog(selected_group)
+
 # --- Sidebar: Role Control ---
 with st.sidebar:
     st.header("⚙️ 班级控制台")
+    if st.session_state.sync.pending:
+        st.caption("☁️ 正在后台同步数据...")
+    elif st.session_state.get("last_sync_ok") is False:
+        st.error(f"同步失败: {st.session_state.sync.error}")
     
     # Role Switcher
     role = st.radio("当前身份", ["管理员", "小组组长"], horizontal=True)
@@ -335,101 +1016,34 @@ with st.sidebar:
         if password == "THU2024": # Default Admin Password
             
             # --- Approval Queue ---
-            if st.session_state.approvals:
-                st.warning(f"🔔 有 {len(st.session_state.approvals)} 条待审核申请")
-                with st.expander("📋 审核队列 (点击处理)", expanded=True):
-                    # Iterate over a copy to safely modify the list
-                    for i, item in enumerate(list(st.session_state.approvals)):
-                        st.markdown(f"**{item['group']}**")
-                        
-                        if item.get("type") == "leave":
-                            st.warning(f"📄 请假申请 | {item['name']} | {item['hours']}小时")
-                            st.text(f"原因: {item['reason']}")
-                            
-                            c1, c2 = st.columns(2)
-                            if c1.button("✅ 批准", key=f"app_{i}"):
-                                # Record leave
-                                st.session_state.leave_records.append({
-                                    "group": item['group'],
-                                    "name": item['name'],
-                                    "hours": item['hours']
-                                })
-                                # Update group total leave hours
-                                idx = st.session_state.data[st.session_state.data["小组"] == item['group']].index[0]
-                                st.session_state.data.loc[idx, "总请假时长"] += item['hours']
-                                
-                                log_msg = f"{datetime.now().strftime('%H:%M')} | [请假批准] {item['group']}-{item['name']} 请假 {item['hours']}小时"
-                                st.session_state.logs.insert(0, log_msg)
-                                st.session_state.approvals.pop(i)
-                                
-                                # DB Sync
-                                save_all_data(f"Approve leave: {item['name']}")
-                                st.rerun()
-                                
-                            if c2.button("❌ 驳回", key=f"rej_{i}"):
-                                st.session_state.approvals.pop(i)
-                                # DB Sync
-                                save_all_data(f"Reject leave: {item['name']}")
-                                st.rerun()
-                                
-                        else:
-                            # Normal score approval
-                            st.caption(f"{item['dimension']} | {item['change']:+d}分 | {item['timestamp']}")
-                            st.text(f"原因: {item['reason']}")
-                            
-                            c1, c2 = st.columns(2)
-                            if c1.button("✅ 通过", key=f"app_{i}"):
-                                # Apply change
-                                idx = st.session_state.data[st.session_state.data["小组"] == item['group']].index[0]
-                                st.session_state.data.loc[idx, item['dimension']] += item['change']
-                                st.session_state.data.loc[idx, "总分"] += item['change']
-                                log_msg = f"{datetime.now().strftime('%H:%M')} | [审核通过] {item['group']} {item['dimension']} {item['change']:+d} | 原因: {item['reason']}"
-                                st.session_state.logs.insert(0, log_msg)
-                                st.session_state.approvals.pop(i)
-                                
-                                # DB Sync
-                                save_all_data(f"Approve score: {item['group']}")
-                                st.rerun()
-                                
-                            if c2.button("❌ 驳回", key=f"rej_{i}"):
-                                st.session_state.approvals.pop(i)
-                                # DB Sync
-                                save_all_data(f"Reject score: {item['group']}")
-                                st.rerun()
-                        st.divider()
-            else:
-                st.success("✨ 所有申请已处理完毕")
+            render_approvals()
             
             st.divider()
 
             st.subheader("快捷评分")
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("⏱️ 迟到扣分", use_container_width=True):
-                    batch_quick_score_dialog("迟到扣分", "自强不息(准时)", -5, "迟到人数", "迟到")
-                if st.button("🤝 互助加分", use_container_width=True):
-                    batch_quick_score_dialog("互助加分", "厚德载物(互助)", 5, "表扬人次", "课后整洁/助人")
-            with col2:
-                if st.button("📵 违纪扣分", use_container_width=True):
-                    single_quick_score_dialog("行胜于言(专注)", -10, "违纪次数", "课堂违纪")
-                if st.button("🏃 活力加分", use_container_width=True):
-                    batch_quick_score_dialog("活力加分", "无体育不清华(活力)", 5, "积极人次", "晨跑/课间操")
+            render_quick_score()
                     
             st.divider()
             st.subheader("小组管理")
             with st.expander("📝 修改小组名称"):
-                old_name = st.selectbox("选择要修改的小组", st.session_state.data["小组"].tolist())
-                new_name = st.text_input("输入新名称")
+                old_name = st.selectbox("选择要修改的小组", groups_list)
+                new_name = st.text_input("输入新名称").strip()
                 
                 if st.button("确认改名"):
-                    if not new_name.strip():
+                    if not new_name:
                         st.error("名称不能为空")
-                    elif new_name in st.session_state.data["小组"].values:
+                    elif new_name in st.session_state.data.index:
                         st.error("该小组名称已存在！")
                     else:
-                        idx = st.session_state.data[st.session_state.data["小组"] == old_name].index[0]
-                        st.session_state.data.at[idx, "小组"] = new_name
-                        st.session_state.logs.insert(0, f"{datetime.now().strftime('%H:%M')} | 系统消息: {old_name} 更名为 {new_name}")
+                        st.session_state.data.rename(index={old_name: new_name}, inplace=True)
+                        st.session_state.data.at[new_name, "小组"] = new_name
+                        mark_data_changed()
+                        st.session_state.group_passwords[new_name] = st.session_state.group_passwords.pop(old_name, default_password_hash())
+                        st.session_state[f"auth_{new_name}"] = st.session_state.pop(f"auth_{old_name}", False)
+                        # Pending approvals and leave records must point at the new index label
+                        st.session_state.approvals = _renamed(st.session_state.approvals, {old_name: new_name})
+                        st.session_state.leave_records = _renamed(st.session_state.leave_records, {old_name: new_name})
+                        add_log(f"{datetime.now().strftime('%H:%M')} | 系统消息: {old_name} 更名为 {new_name}")
                         
                         # DB Sync
                         if save_all_data(f"Rename group: {old_name} -> {new_name}"):
@@ -440,15 +1054,7 @@ with st.sidebar:
             with st.expander("📲 生成分享二维码"):
                 qr_url = st.text_input("输入部署后的网址", placeholder="https://tsinghuadashboard.streamlit.app")
                 if qr_url:
-                    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                    qr.add_data(qr_url)
-                    qr.make(fit=True)
-                    img = qr.make_image(fill_color="black", back_color="white")
-                    
-                    # Convert to bytes
-                    buf = BytesIO()
-                    img.save(buf, format="PNG")
-                    byte_im = buf.getvalue()
+                    byte_im = make_qr_png(qr_url)
                     
                     st.image(byte_im, caption="扫码访问看板", width=200)
                     st.download_button(
@@ -465,32 +1071,31 @@ with st.sidebar:
             
     else: # Group Leader
         st.subheader("组长工作台")
-        selected_group = st.selectbox("选择你的小组", st.session_state.data["小组"])
-        gp_pw = st.text_input("小组密码", type="password", help="默认密码为 123")
+        selected_group = st.selectbox("选择你的小组", groups_list)
+        auth_key = f"auth_{selected_group}"
         
-        if gp_pw == GROUP_PASSWORDS.get(selected_group, ""):
+        if not st.session_state.get(auth_key):
+            # Verify only on submit so bcrypt doesn't run on every keystroke
+            with st.form(key="form_group_login"):
+                gp_pw = st.text_input("小组密码", type="password", help="默认密码为 123")
+                login_btn = st.form_submit_button("登录")
+            if login_btn:
+                if check_group_password(selected_group, gp_pw):
+                    st.session_state[auth_key] = True
+                else:
+                    st.error("❌ 密码错误")
+        
+        if st.session_state.get(auth_key):
             st.success(f"✅ 已登录: {selected_group}")
             
             # Show current score
-            group_data = st.session_state.data[st.session_state.data["小组"] == selected_group].iloc[0]
+            group_data = st.session_state.data.loc[selected_group]
             st.metric("当前总分", f"{int(group_data['总分'])} 分")
             
             st.markdown("### 提交申请")
-            c1, c2 = st.columns(2)
-            with c1:
-                if st.button("⏱️ 登记迟到", use_container_width=True):
-                    leader_quick_submit_dialog(selected_group, "自强不息(准时)", -5, "迟到人数", "组员迟到")
-                if st.button("🏃 登记活力", use_container_width=True):
-                    leader_quick_submit_dialog(selected_group, "无体育不清华(活力)", 5, "积极人次", "晨跑/课间操")
-            with c2:
-                if st.button("🤝 登记互助", use_container_width=True):
-                    leader_quick_submit_dialog(selected_group, "厚德载物(互助)", 5, "表扬人次", "课后整洁/助人")
-                if st.button("📄 登记请假", use_container_width=True):
-                    leave_submit_dialog(selected_group)
+            render_leader_actions(selected_group)
                 
             st.info("💡 提交后需等待管理员审核生效")
-        elif gp_pw:
-            st.error("❌ 密码错误")
 
 # --- Main Dashboard Display ---
 st.title("💜 清华大学武汉企业家研修二期")
@@ -499,59 +1104,20 @@ st.subheader("“自强不息，厚德载物” —— 班级纪律实时统计"
 # 1. Marathon Progress
 st.markdown(f"### 🏃 清华园马拉松进度 (目标: {TARGET_SCORE}分)")
 
-# Use st.columns(2) for responsive grid
-for i, row in st.session_state.data.iterrows():
-    if i % 2 == 0:
-        cols = st.columns(2)
-    
-    col_idx = i % 2
-    with cols[col_idx]:
-        st.markdown(f"**{row['小组']}**")
-        progress = min(row['总分'] / TARGET_SCORE, 1.0)
-        st.progress(progress)
-        st.caption(f"当前积分: {int(row['总分'])} 分")
-        
-        # Display leave info
-        leave_hours = row['总请假时长']
-        if leave_hours > 0:
-            st.info(f"📅 请假累计: {leave_hours}h")
+render_progress()
 
 st.divider()
 
 # 2. Charts
-tab1, tab2 = st.tabs(["🕸️ 能量雷达", "🏆 积分排行"])
-
-with tab1:
-    # Melt data for Radar Chart
-    df_melt = st.session_state.data.melt(
-        id_vars="小组", 
-        value_vars=["自强不息(准时)", "行胜于言(专注)", "厚德载物(互助)", "无体育不清华(活力)"]
-    )
-    fig = px.line_polar(
-        df_melt, r="value", theta="variable", color="小组", line_close=True,
-        color_discrete_sequence=px.colors.qualitative.Prism
-    )
-    fig.update_layout(
-        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-        legend=dict(orientation="h", yanchor="top", y=-0.15, xanchor="center", x=0.5)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-    
-with tab2:
-    rank_df = st.session_state.data[["小组", "总分"]].sort_values(by="总分", ascending=False)
-    fig_rank = px.bar(
-        rank_df, x="总分", y="小组", orientation='h',
-        color="总分", color_continuous_scale="Purples"
-    )
-    fig_rank.update_layout(showlegend=False)
-    st.plotly_chart(fig_rank, use_container_width=True)
+render_charts()
 
 # 3. Alerts and Logs
 st.divider()
 
 with st.expander("⛰️ 思过崖 (预警区)", expanded=True):
     # 1. Low Score Warning
-    low_performers = st.session_state.data[st.session_state.data["总分"] < LOW_SCORE_THRESHOLD]["小组"].tolist()
+    df = st.session_state.data
+    low_performers = df.loc[df["总分"] < LOW_SCORE_THRESHOLD, "小组"].tolist()
     if low_performers:
         for group in low_performers:
             st.error(f"🚨 {group}：学分亮红灯 (<{LOW_SCORE_THRESHOLD}分)，请及时充能！")
@@ -560,22 +1126,17 @@ with st.expander("⛰️ 思过崖 (预警区)", expanded=True):
     has_leave_warning = False
     
     # Aggregate leave by person (names can be duplicated across groups, so key by group+name)
-    person_leaves = {}
-    for record in st.session_state.leave_records:
-        key = f"{record['group']}-{record['name']}"
-        person_leaves[key] = person_leaves.get(key, 0) + record['hours']
-        
-    for key, total_hours in person_leaves.items():
-        if total_hours > MAX_LEAVE_HOURS:
-            st.error(f"🚫 不予结业：{key} (请假 {total_hours}h > {MAX_LEAVE_HOURS}h)")
-            has_leave_warning = True
+    leave_records = tuple((r["group"], r["name"], r["hours"]) for r in st.session_state.leave_records)
+    for (group, name), total_hours in over_limit_leaves(leave_records).items():
+        st.error(f"🚫 不予结业：{group}-{name} (请假 {total_hours}h > {MAX_LEAVE_HOURS}h)")
+        has_leave_warning = True
             
     if not low_performers and not has_leave_warning:
         st.success("🎉 暂无小组挂科，全员优异！")
 
 with st.expander("📜 班级能量日志", expanded=False):
     if st.session_state.logs:
-        for log in st.session_state.logs[:10]: # Show last 10
+        for log in itertools.islice(st.session_state.logs, 10): # Show last 10
             st.text(log)
     else:
         st.text("暂无记录")